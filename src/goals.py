@@ -6,11 +6,38 @@ Goal logic + HR compliance gates.
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta
-from typing import Dict, Tuple
+from datetime import date, datetime, timedelta, timezone
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, List, Tuple
 
+import numpy as np
 import pandas as pd
 
+__all__ = [
+    "EASY_HR_CAP",
+    "LONG_HR_CAP",
+    "THRESH_HR_CAP",
+    "HR_GATE_WINDOW_DAYS",
+    "RACE_DATE",
+    "FINISH_LOOKBACK_DAYS",
+    "FINISH_MIN_RUNS_PER_WEEK",
+    "FINISH_LONG_RUN_MIN_TARGET",
+    "FINISH_LONG_RUN_STRETCH_TARGET",
+    "CAP_BY_TYPE",
+    "RUN_TYPES",
+    "CAPS_BY_CODE",
+    "GoalStatus",
+    "is_hr_gate_pass",
+    "hr_counts",
+    "compute_hr_compliance",
+    "finish_goal",
+    "time_goal",
+    "compute_race_pace_level",
+    "build_speedometer_graphic",
+    "build_goal_block",
+]
+
 # --- Config you asked for ---
 EASY_HR_CAP = 145
 LONG_HR_CAP = 155
@@ -26,12 +53,31 @@ FINISH_MIN_RUNS_PER_WEEK = 2.0  # average over lookback
 FINISH_LONG_RUN_MIN_TARGET = 60.0  # early baseline; will ramp later
 FINISH_LONG_RUN_STRETCH_TARGET = 75.0  # better indicator
 
+# Window offsets from the latest run back to the first day of each window (inclusive)
+_HR_WINDOW_DELTA = timedelta(days=HR_GATE_WINDOW_DAYS - 1)
+_FINISH_WINDOW_DELTA = np.timedelta64(FINISH_LOOKBACK_DAYS - 1, "D")
+_FINISH_WEEKS = FINISH_LOOKBACK_DAYS / 7.0
+
+
+# Race pace confidence: pace breakpoints (min/mi) and the level for each bucket.
+# Buckets are [lo, hi) except the last, where a 15.0 min/mi pace still counts as finishing.
+_PACE_BINS = np.array([10.0, 11.6, 13.0, np.nextafter(15.0, np.inf)])
+_PACE_LEVELS = np.array([5, 4, 3, 2, 1])
+
 
-CAP_BY_TYPE = {
+# Read-only so the shared mapping can't be mutated by a caller.
+CAP_BY_TYPE = MappingProxyType({
     "easy": EASY_HR_CAP,
     "long": LONG_HR_CAP,
     "threshold": THRESH_HR_CAP,
-}
+})
+_CAPS_ITEMS = tuple(CAP_BY_TYPE.items())
+
+# run_type codes index into this tuple (same order parse_fit encodes them in); unknown types get -1
+RUN_TYPES = tuple(rt for rt, _ in _CAPS_ITEMS)
+CAPS_BY_CODE = np.array([cap for _, cap in _CAPS_ITEMS], dtype=np.int16)
+# float copy with a trailing NaN, so code -1 gathers "no cap"
+_CAPS_LOOKUP = np.append(CAPS_BY_CODE.astype("float64"), np.nan)
 
 
 @dataclass(frozen=True)
@@ -44,46 +90,116 @@ def _status(label: str, evidence: str) -> GoalStatus:
     return GoalStatus(label=label, evidence=evidence)
 
 
-def compute_hr_compliance(df: pd.DataFrame, today: date | None = None) -> Tuple[bool, Dict]:
+@dataclass(frozen=True, eq=False)
+class _RunArrays:
     """
-    Returns: (pass_gate, details)
-    Gate fails if ANY run in the window exceeds its run-type cap.
+    A runs DataFrame seen as plain NumPy arrays. Each column is converted on first use,
+    so a path only pays for (and only requires) the columns it actually reads.
     """
-    if df.empty:
-        return True, {"window": f"last {HR_GATE_WINDOW_DAYS} days", "failures": [], "counts": {}}
+    df: pd.DataFrame
 
-    if today is None:
-        today = pd.Timestamp(df["date"].max()).date()
-
-    window_start = pd.Timestamp(today - timedelta(days=HR_GATE_WINDOW_DAYS - 1))
-    w = df[df["date"] >= window_start].copy()
-
-    failures = []
-    counts = {}
-
-    for rt, cap in CAP_BY_TYPE.items():
-        sub = w[w["run_type"] == rt].copy()
-        if sub.empty:
-            counts[rt] = {"pass": 0, "fail": 0, "cap": cap}
-            continue
-        # avg_hr might be null for some activities
-        sub = sub.dropna(subset=["avg_hr"])
-        fail = sub[sub["avg_hr"] > cap]
-        pass_ = sub[sub["avg_hr"] <= cap]
-        counts[rt] = {"pass": int(len(pass_)), "fail": int(len(fail)), "cap": cap}
-        for _, r in fail.iterrows():
-            failures.append({
-                "date": pd.Timestamp(r["date"]).date().isoformat(),
-                "run_type": rt,
-                "avg_hr": int(r["avg_hr"]),
-                "cap": cap,
-                "source_file": r.get("source_file", ""),
-            })
+    @cached_property
+    def dates(self) -> np.ndarray:
+        # datetime64[D]
+        return self.df["date"].to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+
+    @cached_property
+    def codes(self) -> np.ndarray:
+        # index into RUN_TYPES, -1 if unknown
+        run_type = self.df["run_type"]
+        # runs.parquet already stores run_type with RUN_TYPES as its categories; only recode otherwise
+        if not (isinstance(run_type.dtype, pd.CategoricalDtype) and tuple(run_type.cat.categories) == RUN_TYPES):
+            run_type = run_type.astype(pd.CategoricalDtype(RUN_TYPES))
+        return run_type.cat.codes.to_numpy()
+
+    @cached_property
+    def caps(self) -> np.ndarray:
+        # float64 cap per run, NaN for unknown run types
+        return _CAPS_LOOKUP[self.codes]
+
+    @cached_property
+    def avg_hr(self) -> np.ndarray:
+        return self._float_column("avg_hr")
+
+    @cached_property
+    def duration_min(self) -> np.ndarray:
+        return self._float_column("duration_min")
+
+    @cached_property
+    def avg_pace_minmi(self) -> np.ndarray:
+        return self._float_column("avg_pace_minmi")
+
+    def _float_column(self, name: str) -> np.ndarray:
+        # float64, NaN when missing
+        return self.df[name].to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _latest_date(r: _RunArrays) -> date:
+    return r.dates.max().item()
+
+
+def _hr_window(r: _RunArrays, today: date) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (valid, fail) masks: runs inside the HR gate window ending on `today` with an
+    avg HR and a known cap, and those of them above their cap.
+    """
+    window_start = np.datetime64(today - _HR_WINDOW_DELTA, "D")
+    # avg_hr might be null for some activities
+    valid = (r.dates >= window_start) & ~np.isnan(r.avg_hr) & ~np.isnan(r.caps)
+    return valid, valid & (r.avg_hr > r.caps)
+
+
+def _failure_records(r: _RunArrays, idx: np.ndarray) -> List[Dict]:
+    dates = np.datetime_as_string(r.dates[idx], unit="D")
+    # only the failing rows' source files are needed; tolerate frames without the column
+    if "source_file" in r.df.columns:
+        sources = r.df["source_file"].iloc[idx].tolist()
+    else:
+        sources = [""] * len(idx)
+    return [
+        {
+            "date": str(d),
+            "run_type": RUN_TYPES[code],
+            "avg_hr": int(hr),
+            "cap": int(cap),
+            "source_file": src,
+        }
+        for d, code, hr, cap, src in zip(dates, r.codes[idx], r.avg_hr[idx], r.caps[idx], sources)
+    ]
+
+
+def _hr_counts(r: _RunArrays, valid: np.ndarray, fail: np.ndarray) -> Dict:
+    n_types = len(RUN_TYPES)
+    totals = np.bincount(r.codes[valid], minlength=n_types)
+    fails = np.bincount(r.codes[fail], minlength=n_types)
+    return {
+        rt: {"pass": int(totals[i] - fails[i]), "fail": int(fails[i]), "cap": cap}
+        for i, (rt, cap) in enumerate(_CAPS_ITEMS)
+    }
+
+
+def _hr_gate_pass(r: _RunArrays, today: date) -> Tuple[bool, Dict | None]:
+    _, fail = _hr_window(r, today)
+    idx = np.flatnonzero(fail)
+    if idx.size == 0:
+        return True, None
+    # argmin picks the first run of the earliest run type, matching compute_hr_compliance's order
+    return False, _failure_records(r, idx[[r.codes[idx].argmin()]])[0]
+
+
+def _compute_hr_compliance(r: _RunArrays, today: date) -> Tuple[bool, Dict]:
+    window_start = today - _HR_WINDOW_DELTA
+    valid, fail = _hr_window(r, today)
+    counts = _hr_counts(r, valid, fail)
+
+    # Failures are reported grouped by run type (in CAP_BY_TYPE order), then in dataset order.
+    idx = np.flatnonzero(fail)
+    failures = _failure_records(r, idx[np.argsort(r.codes[idx], kind="stable")])
 
     pass_gate = len(failures) == 0
     details = {
         "window": f"last {HR_GATE_WINDOW_DAYS} days",
-        "window_start": pd.Timestamp(window_start).date().isoformat(),
+        "window_start": window_start.isoformat(),
         "window_end": today.isoformat(),
         "counts": counts,
         "failures": failures,
@@ -91,23 +207,13 @@ def compute_hr_compliance(df: pd.DataFrame, today: date | None = None) -> Tuple[
     return pass_gate, details
 
 
-def finish_goal(df: pd.DataFrame) -> GoalStatus:
-    """
-    Goal 1: Finish the HM. Based on consistency + long run progression.
-    """
-    if df.empty:
-        return _status("❌ Not on track", "No runs recorded yet.")
+def _finish_goal(r: _RunArrays) -> GoalStatus:
+    in_win = r.dates >= r.dates.max() - _FINISH_WINDOW_DELTA
+    runs_per_week = int(in_win.sum()) / _FINISH_WEEKS
 
-    today = pd.Timestamp(df["date"].max()).date()
-    start = pd.Timestamp(today - timedelta(days=FINISH_LOOKBACK_DAYS - 1))
-    w = df[df["date"] >= start].copy()
-
-    days = (pd.Timestamp(today) - start).days + 1
-    weeks = max(days / 7.0, 1e-6)
-    runs_per_week = len(w) / weeks
-
-    long_runs = w[w["run_type"] == "long"]
-    long_max = float(long_runs["duration_min"].max()) if not long_runs.empty else 0.0
+    long_dur = r.duration_min[in_win & (r.codes == RUN_TYPES.index("long"))]
+    long_dur = long_dur[~np.isnan(long_dur)]
+    long_max = float(long_dur.max()) if long_dur.size else 0.0
 
     if runs_per_week >= FINISH_MIN_RUNS_PER_WEEK and long_max >= FINISH_LONG_RUN_MIN_TARGET:
         label = "✅ On track"
@@ -120,6 +226,86 @@ def finish_goal(df: pd.DataFrame) -> GoalStatus:
     return _status(label, evidence)
 
 
+def _race_pace_level(r: _RunArrays, hr_pass: bool) -> Tuple[int, float]:
+    # Use recent easy/threshold runs as pace indicators (exclude long runs which are slower)
+    recent = np.isin(r.codes, [RUN_TYPES.index("easy"), RUN_TYPES.index("threshold")])
+    if not recent.any():
+        return 1, 0.0
+
+    # Average pace from recent runs (missing paces are skipped)
+    pace = r.avg_pace_minmi[recent]
+    pace = pace[~np.isnan(pace)]
+    avg_pace = float(pace.mean()) if pace.size else float("nan")
+
+    # NaN pace sorts past every breakpoint, i.e. level 1
+    base_level = int(_PACE_LEVELS[np.searchsorted(_PACE_BINS, avg_pace, side="right")])
+
+    # Boost rule: if HR compliance gates are passing AND the base pace
+    # already meets the 2:30 mark (base_level >= 3), increase confidence by 1.
+    # This reflects that being HR-compliant makes a 2:30-capable pace more credible.
+    level = base_level
+    if hr_pass and base_level >= 3:
+        level = min(5, base_level + 1)
+
+    return level, avg_pace
+
+
+def is_hr_gate_pass(df: pd.DataFrame, today: date | None = None) -> Tuple[bool, Dict | None]:
+    """
+    Returns: (pass_gate, first_failure or None)
+    Cheaper than compute_hr_compliance when only the gate matters: no counts, no full failure list.
+    External API for callers outside the README pipeline; build_goal_block needs the full details.
+    """
+    if df.empty:
+        return True, None
+
+    r = _RunArrays(df)
+    if today is None:
+        today = _latest_date(r)
+
+    return _hr_gate_pass(r, today)
+
+
+def hr_counts(df: pd.DataFrame, today: date | None = None) -> Dict:
+    """
+    Per-run-type pass/fail counts for the HR gate window.
+    External API, like is_hr_gate_pass; build_goal_block gets counts from compute_hr_compliance.
+    """
+    if df.empty:
+        return {}
+
+    r = _RunArrays(df)
+    if today is None:
+        today = _latest_date(r)
+
+    return _hr_counts(r, *_hr_window(r, today))
+
+
+def compute_hr_compliance(df: pd.DataFrame, today: date | None = None) -> Tuple[bool, Dict]:
+    """
+    Returns: (pass_gate, details)
+    Gate fails if ANY run in the window exceeds its run-type cap.
+    """
+    if df.empty:
+        return True, {"window": f"last {HR_GATE_WINDOW_DAYS} days", "failures": [], "counts": {}}
+
+    r = _RunArrays(df)
+    if today is None:
+        today = _latest_date(r)
+
+    return _compute_hr_compliance(r, today)
+
+
+def finish_goal(df: pd.DataFrame) -> GoalStatus:
+    """
+    Goal 1: Finish the HM. Based on consistency + long run progression.
+    """
+    if df.empty:
+        return _status("❌ Not on track", "No runs recorded yet.")
+
+    return _finish_goal(_RunArrays(df))
+
+
 def time_goal(df: pd.DataFrame, goal_name: str, hr_gate_pass: bool, hr_details: Dict) -> GoalStatus:
     """
     Goal 2/3: Time goals. Hard-failed by HR gate.
@@ -158,39 +344,14 @@ def compute_race_pace_level(df: pd.DataFrame) -> Tuple[int, float]:
     if df.empty:
         return 1, 0.0
 
-    # Use recent easy/threshold runs as pace indicators (exclude long runs which are slower)
-    recent = df[df["run_type"].isin(["easy", "threshold"])].copy()
-    if recent.empty:
-        return 1, 0.0
-
-    # Average pace from recent runs
-    avg_pace = float(recent["avg_pace_minmi"].mean())
-
-    if avg_pace < 10.0:  # Under 2:00 pace
-        base_level = 5
-    elif avg_pace < 11.6:  # 2:00 - 2:15 range
-        base_level = 4
-    elif avg_pace < 13.0:  # 2:15 - 2:30 range
-        base_level = 3
-    elif avg_pace <= 15.0:  # 2:30 - finish range
-        base_level = 2
-    else:  # Won't finish
-        base_level = 1
-
-    # Boost rule: if HR compliance gates are passing AND the base pace
-    # already meets the 2:30 mark (base_level >= 3), increase confidence by 1.
-    # This reflects that being HR-compliant makes a 2:30-capable pace more credible.
+    r = _RunArrays(df)
     try:
-        latest_date = pd.Timestamp(df["date"].max()).date()
-        hr_pass, _ = compute_hr_compliance(df, today=latest_date)
+        # columns are converted lazily, so a bad date/avg_hr column fails here and falls back
+        hr_pass, _ = _hr_gate_pass(r, today=_latest_date(r))
     except Exception:
         hr_pass = False
 
-    level = base_level
-    if hr_pass and base_level >= 3:
-        level = min(5, base_level + 1)
-
-    return level, avg_pace
+    return _race_pace_level(r, hr_pass)
 
 
 def build_speedometer_graphic(level: int) -> str:
@@ -225,16 +386,18 @@ def build_goal_block(df: pd.DataFrame) -> str:
     Returns the markdown block to inject into README between GOAL_STATUS markers.
     """
     if df.empty:
-        updated = datetime.utcnow().date().isoformat()
-        return f"_Last updated: {updated}_\n\nNo runs yet."
+        updated = datetime.now(timezone.utc).date().isoformat()
+        return "\n".join([f"_Last updated: {updated}_", "", "No runs yet."])
 
-    latest_date = pd.Timestamp(df["date"].max()).date()
+    # Convert to arrays once and reuse them for every goal below.
+    r = _RunArrays(df)
+    latest_date = _latest_date(r)
     weeks_to_race = (RACE_DATE - latest_date).days / 7.0
 
-    hr_pass, hr_details = compute_hr_compliance(df, today=latest_date)
+    hr_pass, hr_details = _compute_hr_compliance(r, today=latest_date)
     
     # Calculate race pace level and speedometer
-    pace_level, avg_pace = compute_race_pace_level(df)
+    pace_level, avg_pace = _race_pace_level(r, hr_pass)
     speedometer = build_speedometer_graphic(pace_level)
 
     # HR compliance summary lines
@@ -245,14 +408,14 @@ def build_goal_block(df: pd.DataFrame) -> str:
     lines.append(f"(Recent avg pace: {avg_pace:.2f} min/mi)")
     lines.append("")
     lines.append(f"**HR compliance ({hr_details['window']}):** {hr_label}")
-    for rt in ["easy", "long", "threshold"]:
-        c = hr_details["counts"].get(rt, {"pass": 0, "fail": 0, "cap": CAP_BY_TYPE[rt]})
+    # counts always has every run type (zeros included), in CAP_BY_TYPE order
+    for rt, c in hr_details["counts"].items():
         lines.append(f"- {rt} cap {c['cap']}: {c['pass']}/{c['pass'] + c['fail']} pass")
     if not hr_pass and hr_details.get("failures"):
         f = hr_details["failures"][0]
         lines.append(f"- First failure: **{f['run_type']}** avg HR **{f['avg_hr']}** > {f['cap']} on **{f['date']}**")
 
-    finish = finish_goal(df)
+    finish = _finish_goal(r)
     g_230 = time_goal(df, "sub_2_30", hr_pass, hr_details)
     g_200 = time_goal(df, "sub_2_00", hr_pass, hr_details)
 
@@ -265,5 +428,4 @@ def build_goal_block(df: pd.DataFrame) -> str:
     ]
 
     updated = latest_date.isoformat()
-    header = "\n".join(lines) + "\n\n" + "\n".join(table) + f"\n\n_Last updated: {updated}_"
-    return header
+    return "\n".join([*lines, "", *table, "", f"_Last updated: {updated}_"])
@@ -10,16 +10,24 @@ Run type is determined by folder:
 Outputs:
   data/processed/runs.parquet
   data/processed/runs.csv
+
+Files whose mtime and size are unchanged since the last run are not re-parsed
+(see data/processed/parse_cache.parquet).
 """
 
 from __future__ import annotations
 
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from fitparse import FitFile
 
 
@@ -27,6 +35,21 @@ ROOT = Path(__file__).resolve().parents[1]
 RAW_DIR = ROOT / "data" / "raw"
 OUT_PARQUET = ROOT / "data" / "processed" / "runs.parquet"
 OUT_CSV = ROOT / "data" / "processed" / "runs.csv"
+PARSE_CACHE = ROOT / "data" / "processed" / "parse_cache.parquet"
+
+# Fewer new/changed files than this are parsed inline instead of in a process pool.
+PARALLEL_MIN_FILES = 4
+
+RUNS_SCHEMA = pa.schema([
+    ("date", pa.timestamp("ns")),
+    ("week", pa.string()),
+    ("run_type", pa.dictionary(pa.int8(), pa.string())),
+    ("duration_min", pa.float64()),
+    ("distance_mi", pa.float64()),
+    ("avg_pace_minmi", pa.float64()),
+    ("avg_hr", pa.int16()),
+    ("source_file", pa.string()),
+])
 
 RUN_TYPE_DIRS = {
     "easy": RAW_DIR / "easy",
@@ -59,14 +82,12 @@ def parse_fit_summary(fit_path: Path) -> Dict:
     Extract a single-session summary from a FIT file.
     We prefer the 'session' message because it contains totals.
     """
-    fit = FitFile(str(fit_path))
-
-    sessions = list(fit.get_messages("session"))
-    if not sessions:
-        raise ValueError(f"No 'session' message found in {fit_path}")
-
-    sess = sessions[0]
-    fields = {f.name: f.value for f in sess}
+    # fitparse decodes lazily, so stopping at the first session skips the rest of the file.
+    with FitFile(str(fit_path)) as fit:
+        sess = next(fit.get_messages("session"), None)
+        if sess is None:
+            raise ValueError(f"No 'session' message found in {fit_path}")
+        fields = {f.name: f.value for f in sess}
 
     start_time = _safe_get(fields, "start_time")
     if start_time is None:
@@ -93,52 +114,130 @@ def parse_fit_summary(fit_path: Path) -> Dict:
     }
 
 
+def _parse_one(job: Tuple[str, str]) -> Dict:
+    """
+    Parse one FIT file into a runs row. Module-level so it can run in worker processes.
+    """
+    run_type, fit_path_str = job
+    fit_path = Path(fit_path_str)
+    summary = parse_fit_summary(fit_path)
+    start_time = summary["start_time"]
+
+    # derive date
+    if start_time is not None:
+        date = pd.to_datetime(start_time).date()
+    else:
+        # fallback: mtime
+        date = pd.to_datetime(fit_path.stat().st_mtime, unit="s").date()
+
+    return {
+        "date": pd.Timestamp(date),
+        "run_type": run_type,
+        "duration_min": float(summary["duration_min"]),
+        "distance_mi": float(summary["distance_mi"]),
+        "avg_pace_minmi": (float(summary["avg_pace_minmi"]) if summary["avg_pace_minmi"] is not None else None),
+        "avg_hr": summary["avg_hr"],
+        "source_file": str(fit_path.relative_to(ROOT)),
+    }
+
+
+def _parser_key() -> str:
+    h = hashlib.blake2b(digest_size=16)
+    # any edit to this parser invalidates every cached row
+    h.update(Path(__file__).read_bytes())
+    return h.hexdigest()
+
+
+def _load_parse_cache(parser_key: str) -> Dict[str, Dict]:
+    """
+    Previously parsed rows keyed by source_file, each with the mtime_ns/size it was parsed at.
+    The whole cache is discarded when it was written by a different version of this parser.
+    """
+    if not PARSE_CACHE.exists():
+        return {}
+    cache_df = pd.read_parquet(PARSE_CACHE)
+    if "parser_key" not in cache_df.columns or not (cache_df["parser_key"] == parser_key).all():
+        return {}
+    cache_df = cache_df.drop(columns="parser_key")
+    # parquet hands nulls back as NaN; restore None so cached rows match freshly parsed ones
+    cache_df = cache_df.astype(object).where(cache_df.notna(), None)
+    return {r["source_file"]: r for r in cache_df.to_dict("records")}
+
+
 def scan_fit_files() -> List[Dict]:
-    rows: List[Dict] = []
+    parser_key = _parser_key()
+    cache = _load_parse_cache(parser_key)
+
+    rows: List[Optional[Dict]] = []
+    stats: List[Tuple[int, int]] = []
+    jobs: List[Tuple[str, str]] = []
+    job_slots: List[int] = []
     for run_type, d in RUN_TYPE_DIRS.items():
         d.mkdir(parents=True, exist_ok=True)
         for fit_path in sorted(d.glob("*.fit")):
-            summary = parse_fit_summary(fit_path)
-            start_time = summary["start_time"]
-
-            # derive date
-            if start_time is not None:
-                date = pd.to_datetime(start_time).date()
+            st = fit_path.stat()
+            cached = cache.get(str(fit_path.relative_to(ROOT)))
+            if cached is not None and (cached["mtime_ns"], cached["size"]) == (st.st_mtime_ns, st.st_size):
+                rows.append({k: v for k, v in cached.items() if k not in ("mtime_ns", "size")})
             else:
-                # fallback: mtime
-                date = pd.to_datetime(fit_path.stat().st_mtime, unit="s").date()
-
-            week = pd.Timestamp(date).isocalendar()
-            week_str = f"{week.year}-W{int(week.week):02d}"
-
-            rows.append({
-                "date": pd.Timestamp(date),
-                "week": week_str,
-                "run_type": run_type,
-                "duration_min": float(summary["duration_min"]),
-                "distance_mi": float(summary["distance_mi"]),
-                "avg_pace_minmi": (float(summary["avg_pace_minmi"]) if summary["avg_pace_minmi"] is not None else None),
-                "avg_hr": summary["avg_hr"],
-                "source_file": str(fit_path.relative_to(ROOT)),
-            })
+                job_slots.append(len(rows))
+                jobs.append((run_type, str(fit_path)))
+                rows.append(None)
+            stats.append((st.st_mtime_ns, st.st_size))
+
+    if len(jobs) < PARALLEL_MIN_FILES:
+        # the usual case (one new file per `make update`): not worth starting a process pool
+        parsed = map(_parse_one, jobs)
+    else:
+        # FIT decoding is pure Python and CPU-bound, so spread a bulk re-parse across processes.
+        # ex.map keeps results in job order.
+        with ProcessPoolExecutor() as ex:
+            parsed = list(ex.map(_parse_one, jobs, chunksize=8))
+    for slot, row in zip(job_slots, parsed):
+        rows[slot] = row
+
+    # rewrite the cache when anything was parsed or files were removed
+    if jobs or len(cache) != len(rows):
+        PARSE_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(
+            [{**row, "mtime_ns": m, "size": size} for row, (m, size) in zip(rows, stats)],
+            columns=[*(rows[0] if rows else []), "mtime_ns", "size"],
+        ).assign(parser_key=parser_key).to_parquet(PARSE_CACHE, index=False)
+
     return rows
 
 
 def main() -> None:
     rows = scan_fit_files()
-    df = pd.DataFrame(rows)
 
-    if df.empty:
+    if not rows:
         print("No .fit files found under data/raw/*")
         return
 
-    df = df.sort_values(["date", "run_type", "source_file"]).reset_index(drop=True)
+    # Build the columns straight from the row dicts with a fixed schema (no pandas dtype inference).
+    # Arrow can't sort on dictionary columns, so run_type is dictionary-encoded after sorting.
+    # week is derived below for the whole column at once.
+    row_schema = RUNS_SCHEMA.remove(RUNS_SCHEMA.get_field_index("week"))
+    row_schema = row_schema.set(row_schema.get_field_index("run_type"), pa.field("run_type", pa.string()))
+    table = pa.Table.from_pylist(rows, schema=row_schema)
+    table = table.sort_by([("date", "ascending"), ("run_type", "ascending"), ("source_file", "ascending")])
+    table = table.add_column(
+        RUNS_SCHEMA.get_field_index("week"), "week", pc.strftime(table["date"], format="%G-W%V")
+    )
+    # Encode run_type against the fixed RUN_TYPE_DIRS order so its codes are the same in every file.
+    run_types = pa.array(list(RUN_TYPE_DIRS))
+    codes = pc.cast(pc.index_in(table["run_type"], value_set=run_types), pa.int8())
+    table = table.set_column(
+        table.schema.get_field_index("run_type"), "run_type", pa.DictionaryArray.from_arrays(codes, run_types)
+    )
+    table = table.cast(RUNS_SCHEMA)
 
     OUT_PARQUET.parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(OUT_PARQUET, index=False)
-    df.to_csv(OUT_CSV, index=False)
+    pq.write_table(table, OUT_PARQUET)
+    # numpy-backed frame for the CSV: Arrow timestamps would print a time part on every date
+    table.to_pandas().to_csv(OUT_CSV, index=False)
 
-    print(f"Wrote {len(df)} runs -> {OUT_PARQUET.relative_to(ROOT)} and {OUT_CSV.relative_to(ROOT)}")
+    print(f"Wrote {table.num_rows} runs -> {OUT_PARQUET.relative_to(ROOT)} and {OUT_CSV.relative_to(ROOT)}")
 
 
 if __name__ == "__main__":
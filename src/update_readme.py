@@ -9,34 +9,70 @@ Usage:
 from __future__ import annotations
 
 from pathlib import Path
-import re
+import hashlib
 import pandas as pd
 
-from goals import build_goal_block
+from goals import RUN_TYPES, build_goal_block
 
 ROOT = Path(__file__).resolve().parents[1]
 README = ROOT / "README.md"
 RUNS_PARQUET = ROOT / "data" / "processed" / "runs.parquet"
+GOALS_PY = Path(__file__).resolve().parent / "goals.py"
+CACHE_DIR = ROOT / ".cache"
+
+# Only the columns goals.py reads; week/distance_mi are never loaded.
+GOAL_COLUMNS = ["date", "run_type", "avg_hr", "duration_min", "avg_pace_minmi", "source_file"]
 
 START = "<!-- GOAL_STATUS_START -->"
 END = "<!-- GOAL_STATUS_END -->"
 
 
-def main() -> None:
-    if RUNS_PARQUET.exists():
-        df = pd.read_parquet(RUNS_PARQUET)
-    else:
-        df = pd.DataFrame()
+def _cache_key() -> str:
+    h = hashlib.blake2b(digest_size=16)
+    # any edit to the code that builds the block invalidates it
+    h.update(GOALS_PY.read_bytes())
+    # the loading code below (columns, dtypes) shapes the block too
+    h.update(Path(__file__).read_bytes())
+    h.update(RUNS_PARQUET.read_bytes())
+    return h.hexdigest()
+
+
+def load_goal_block() -> str:
+    """
+    Build the goal block, reusing the cached copy when runs.parquet and the code are unchanged.
+    """
+    if not RUNS_PARQUET.exists():
+        return build_goal_block(pd.DataFrame())
+
+    cache_path = CACHE_DIR / f"goal_block_{_cache_key()}.md"
+    if cache_path.exists():
+        return cache_path.read_text(encoding="utf-8")
 
+    df = pd.read_parquet(RUNS_PARQUET, columns=GOAL_COLUMNS, dtype_backend="pyarrow")
+    df["run_type"] = df["run_type"].astype(pd.CategoricalDtype(RUN_TYPES))
     block = build_goal_block(df)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # only the current inputs' block is ever useful again; drop the stale ones
+    for stale in CACHE_DIR.glob("goal_block_*.md"):
+        stale.unlink()
+    cache_path.write_text(block, encoding="utf-8")
+    return block
+
+
+def main() -> None:
+    block = load_goal_block()
 
     text = README.read_text(encoding="utf-8")
-    pattern = re.compile(rf"{re.escape(START)}.*?{re.escape(END)}", re.DOTALL)
+
+    # Exactly one marker pair, so a literal find + splice is all that's needed.
+    try:
+        i = text.index(START)
+        j = text.index(END, i + len(START)) + len(END)
+    except ValueError:
+        raise RuntimeError("Could not find GOAL_STATUS markers in README.md") from None
 
     replacement = f"{START}\n{block}\n{END}"
-    new_text, n = pattern.subn(replacement, text, count=1)
-    if n != 1:
-        raise RuntimeError("Could not find GOAL_STATUS markers in README.md")
+    new_text = text[:i] + replacement + text[j:]
 
     README.write_text(new_text, encoding="utf-8")
     print("README updated.")